@@ -1,8 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import matplotlib.pyplot as plt
 import os
 
 # ==========================================
@@ -17,95 +15,276 @@ st.set_page_config(
 # ==========================================
 # 2. DATA LOADING (Updated for your 'data/' folder)
 # ==========================================
-@st.cache_data
-def load_and_clean_data():
-    # Looking for the file in the 'data' folder as per your file tree screenshot
-    file_path = "data/next_day_prediction.csv"
-    
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        df.columns = df.columns.str.strip()
+# Looking for the file in the 'data' folder as per your file tree screenshot
+DATA_PATH = "data/next_day_prediction.csv"
+APP_COLS = ['Fridge', 'Heater', 'Fans', 'Lights', 'TV', 'Microwave', 'Washing_Machine']
+# Compact dtypes for the forecast columns. The integer flags are parsed as float32 so a blank
+# cell arrives as NaN instead of aborting the integer cast, and are narrowed once gaps are filled.
+# is_meal_time must be listed even though it is optional: with a dtype map, the pyarrow engine
+# casts any unlisted integer column to int64 and fails on its blanks. Absent keys are ignored.
+FORECAST_DTYPES = {**{a: 'float32' for a in APP_COLS}, 'electricity_price': 'float32', 'occupancy': 'uint8'}
+PARSE_DTYPES = {**FORECAST_DTYPES, 'occupancy': 'float32', 'is_meal_time': 'float32'}
+
+# Simulated logic for Meal Time based on common high-use hours, as an hour -> flag lookup
+_MEAL_LUT = np.zeros(24, dtype=np.uint8)
+_MEAL_LUT[[8, 12, 13, 19, 20]] = 1
+
+def read_forecast(file_path):
+    # Prefer the Parquet sidecar from an earlier cold start (columnar, keeps dtypes)
+    parquet_path = os.path.splitext(file_path)[0] + ".parquet"
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(file_path):
+        try:
+            return pd.read_parquet(parquet_path)
+        except (ImportError, OSError, ValueError):
+            pass  # Unreadable or half-written sidecar: re-parse the CSV and rewrite it
+
+    # Multithreaded Arrow parser; columns still land as plain NumPy dtypes for the math below
+    df = pd.read_csv(file_path, engine='pyarrow', dtype=PARSE_DTYPES)
+    df.columns = df.columns.str.strip()
+    # Arrow already infers ISO timestamps while parsing; only fall back for other formats
+    if not pd.api.types.is_datetime64_any_dtype(df['datetime']):
         df['datetime'] = pd.to_datetime(df['datetime'])
-        
-        # Calculate Total Load on the fly since it's missing in your CSV
-        app_cols = ['Fridge', 'Heater', 'Fans', 'Lights', 'TV', 'Microwave', 'Washing_Machine']
-        df['Total_Load_Forecasted'] = df[app_cols].sum(axis=1)
-        
-        # Simulated logic for Meal Time based on common high-use hours
-        df['is_meal_time'] = df['datetime'].dt.hour.isin([8, 12, 13, 19, 20]).astype(int)
+    try:
+        df.to_parquet(parquet_path, index=False, compression='zstd')
+    except (ImportError, OSError):
+        pass  # Read-only deploy or no parquet engine: just keep using the CSV
+    return df
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def load_and_clean_data(file_path, mtime):
+    # mtime is only part of the cache key: rewriting the CSV invalidates the cached frame
+    if os.path.exists(file_path):
+        df = read_forecast(file_path)
+
+        # Appliances absent from this forecast count as zero load instead of raising a KeyError
+        df = df.reindex(columns=df.columns.union(APP_COLS, sort=False), fill_value=0)
+        # ...and so do blank cells, as in the old pandas sum, so the NumPy total below stays finite
+        df[APP_COLS] = df[APP_COLS].fillna(0)
+        # A blank occupancy cell counts as an empty house rather than failing the uint8 cast
+        df['occupancy'] = df['occupancy'].fillna(0)
+        # Narrows occupancy to uint8; otherwise a no-op except for padded headers and older sidecars
+        df = df.astype(FORECAST_DTYPES)
+
+        # Calculate Total Load on the fly where your CSV leaves it missing or zero
+        app_total = df[APP_COLS].to_numpy(dtype=np.float32).sum(axis=1)
+        if 'Total_Load_Forecasted' in df.columns:
+            given = df['Total_Load_Forecasted'].to_numpy(dtype=np.float32)
+            df['Total_Load_Forecasted'] = np.where(np.isnan(given) | (given == 0), app_total, given)
+        else:
+            df['Total_Load_Forecasted'] = app_total
+
+        # Keep a real meal-time feature when the forecast has one; only simulate it otherwise,
+        # including for blank cells in a real column, which would fail the uint8 cast
+        simulated = _MEAL_LUT[df['datetime'].dt.hour.to_numpy()]
+        if 'is_meal_time' in df.columns:
+            given = df['is_meal_time'].to_numpy(dtype=np.float32)
+            df['is_meal_time'] = np.where(np.isnan(given), simulated, given).astype(np.uint8)
+        else:
+            df['is_meal_time'] = simulated
         return df
     return None
 
-df = load_and_clean_data()
+df = load_and_clean_data(DATA_PATH, os.path.getmtime(DATA_PATH) if os.path.exists(DATA_PATH) else None)
 
 if df is None:
     st.error("🚨 **File Not Found:** Ensure 'next_day_prediction.csv' is inside the 'data' folder.")
     st.stop()
 
+# Heavy charting imports are only paid for once there is data to draw
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Fixed per-appliance colours, shared by the donut and the trend so they stay stable across hours
+APP_COLORS = dict(zip(APP_COLS, qualitative.Pastel))
+
 # ==========================================
-# 3. SIDEBAR & NAVIGATION
+# 3. AGENT LOGIC
 # ==========================================
-st.sidebar.header("🕹️ Digital Twin Controls")
-selected_hour = st.sidebar.slider("Select Forecast Hour", 0, len(df)-1, 0)
-row = df.iloc[selected_hour]
+# Decision Thresholds
+PRICE_THRESHOLD = 0.4   # $/kWh at or above which an hour counts as peak
+LOAD_THRESHOLD = 2.0    # kW of forecast demand above which an hour counts as peak
+
+@st.cache_data(show_spinner=False)
+def compute_ppo(df, price_threshold=PRICE_THRESHOLD, load_threshold=LOAD_THRESHOLD):
+    # Decide every forecast hour at once so the slider only has to index into the table
+    # Appliances as one (hours x appliances) float32 matrix, in APP_COLS order
+    apps = df[APP_COLS].to_numpy(dtype=np.float32)
+    price = df['electricity_price'].to_numpy()
+    total = df['Total_Load_Forecasted'].to_numpy()
+
+    critical = (price >= price_threshold) | (total > load_threshold)
+    return {
+        'critical': critical,
+        'peak_hours': int(critical.sum()),
+        'message': np.where(critical, "🤖 **PPO Agent:** Load-shedding active.", "🤖 **PPO Agent:** Normal Monitoring."),
+        'label': np.where(critical, "CRITICAL (PEAK)", "OPTIMIZED (NORMAL)"),
+        'color': np.where(critical, "rgba(255, 75, 75, 0.2)", "rgba(75, 255, 75, 0.1)"),
+        'total': total,
+        'apps': apps,
+        'price': price,
+        # Per-hour scalars come out of these arrays, never out of a pandas row
+        'stamp': df['datetime'].astype(str).to_numpy(),
+    }
+
+XAI_FEATURES = ['Electricity Price', 'Total Demand', 'Occupancy', 'Meal Context']
+XAI_COLUMNS = ['electricity_price', 'Total_Load_Forecasted', 'occupancy', 'is_meal_time']
+XAI_COEFFS = np.array([3, 1 / 1.5, 0.4, 1.2], dtype=np.float32)
+XAI_COLOR_PEAK = '#ff4b4b'     # Bars for weights above 1.0
+XAI_COLOR_NORMAL = '#0068c9'
+
+@st.cache_data(show_spinner=False)
+def precompute_xai(df):
+    # Feature attribution weights for every hour as one (hours x features) matrix
+    return df[XAI_COLUMNS].to_numpy(dtype=np.float32) * XAI_COEFFS
+
+ppo = compute_ppo(df)
+xai = precompute_xai(df)
 
 # ==========================================
-# 4. AGENT LOGIC
+# 4. DASHBOARD COMPONENTS
 # ==========================================
-price = float(row['electricity_price'])
-total_load = float(row['Total_Load_Forecasted'])
-occupancy = int(row['occupancy'])
-is_meal = int(row['is_meal_time'])
+# Static markup for the status card; only the glow, status and readings change per hour
+_HOUSE_TMPL = (
+    '<div style="background-color: {glow}; padding: 30px; border-radius: 15px; text-align: center; border: 2px solid #dee2e6;">'
+    '<h1 style="font-size: 80px; margin: 0;">🏠</h1>'
+    '<h2>{status}</h2>'
+    '<p>Load: <b>{load:.2f} kW</b> | Price: <b>${price:.2f}</b></p>'
+    '</div>'
+)
 
-# Decision Thresholds
-is_critical = price >= 0.4 or total_load > 2.0
-status_label = "CRITICAL (PEAK)" if is_critical else "OPTIMIZED (NORMAL)"
-status_color = "rgba(255, 75, 75, 0.2)" if is_critical else "rgba(75, 255, 75, 0.1)"
+def _polar(cx, cy, radius, angle):
+    # Angle 0 points up and grows clockwise, like a Plotly pie
+    return f"{cx + radius * np.sin(angle):.2f} {cy - radius * np.cos(angle):.2f}"
+
+def donut_svg(values_tuple, names_tuple):
+    # A few KB of inline SVG instead of a full Plotly canvas for a 7-slice chart
+    values = np.asarray(values_tuple, dtype=np.float64)
+    total = values.sum()
+    if not total > 0:  # Also true for a NaN total
+        return '<p style="text-align: center;">No appliance load forecast for this hour.</p>'
+
+    cx, cy, r_out = 150, 150, 130
+    r_in = r_out * 0.4
+    ends = np.cumsum(values) / total * 2 * np.pi
+    starts = np.concatenate(([0.0], ends[:-1]))
+
+    parts = []
+    for i, (name, value, a0, a1) in enumerate(zip(names_tuple, values, starts, ends)):
+        pct = value / total * 100
+        color = APP_COLORS[name]
+        if value > 0:
+            a1 = min(a1, a0 + 2 * np.pi - 1e-4)  # A lone 100% slice can't be a single arc
+            large = int(a1 - a0 > np.pi)
+            parts.append(
+                f'<path d="M{_polar(cx, cy, r_out, a0)} A{r_out} {r_out} 0 {large} 1 {_polar(cx, cy, r_out, a1)} '
+                f'L{_polar(cx, cy, r_in, a1)} A{r_in} {r_in} 0 {large} 0 {_polar(cx, cy, r_in, a0)} Z" '
+                f'fill="{color}" stroke="white" stroke-width="1">'
+                f'<title>{name}: {value:.2f} kW ({pct:.1f}%)</title></path>'
+            )
+        y = 40 + i * 32
+        parts.append(
+            f'<rect x="310" y="{y - 12}" width="14" height="14" fill="{color}"/>'
+            f'<text x="332" y="{y}" font-size="14" fill="currentColor">{name} {pct:.1f}%</text>'
+        )
+    return f'<svg viewBox="0 0 480 300" width="100%" style="max-height: 350px;">{"".join(parts)}</svg>'
+
+@st.cache_data(show_spinner=False)
+def build_donuts(apps, names):
+    # Only one donut per forecast hour exists, so render them all up front and index by hour
+    return [donut_svg(tuple(r.tolist()), names) for r in apps]
+
+def xai_fig(weights, colors):
+    # Plotly is already loaded for the trend, so this avoids matplotlib's import and PNG render
+    fig = go.Figure(go.Bar(x=weights, y=XAI_FEATURES, orientation='h', marker_color=colors))
+    fig.update_layout(title="Feature Attribution for PPO Decision", template="plotly_white",
+                      height=300, margin=dict(t=40, b=20, l=20, r=20))
+    return fig
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def xai_hour_fig(xai, hour):
+    # Built on first visit to an hour and kept as a Figure (not a dict), so st.plotly_chart
+    # does not re-validate it on every rerun; a long forecast adds nothing to cold start
+    weights = xai[hour]
+    colors = np.where(weights > 1.0, XAI_COLOR_PEAK, XAI_COLOR_NORMAL)
+    return xai_fig(weights.tolist(), colors.tolist())
+
+# Hours shown either side of the selected hour on the trend chart
+TREND_WINDOW = 6
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def trend_base(df, cols):
+    # The full-forecast traces, built once per forecast version. st.plotly_chart re-validates a
+    # dict on every call but serializes a Figure as-is, so the cache holds real Figures.
+    x = df['datetime']
+    # One (appliances x hours) float32 block, so every trace gets a contiguous row of it
+    ys = np.ascontiguousarray(df[list(cols)].to_numpy(dtype=np.float32).T)
+    fig = go.Figure([go.Scattergl(x=x, y=y, name=a, mode='lines', line=dict(color=APP_COLORS[a]))
+                     for a, y in zip(cols, ys)])
+    fig.update_layout(template="plotly_white")
+    return fig
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def trend_fig(df, cols, hour):
+    # Only the hours actually visited get a windowed copy of the base figure, so a long
+    # forecast costs nothing extra at cold start. Cached Figures are shared across
+    # sessions, so neither the base nor these copies may be mutated after return.
+    base = trend_base(df, cols)
+    x = base.data[0].x
+    lo, hi = max(0, hour - TREND_WINDOW), min(len(x) - 1, hour + TREND_WINDOW)
+    fig = go.Figure(base)
+    fig.update_xaxes(range=[x[lo], x[hi]])
+    fig.add_shape(type='line', xref='x', yref='paper', x0=x[hour], x1=x[hour], y0=0, y1=1,
+                  line=dict(color='#888888', width=2, dash='dot'))
+    return fig
 
 # ==========================================
 # 5. DASHBOARD LAYOUT
 # ==========================================
 st.title("🌐 Residential Digital Twin & XAI Portal")
-st.write(f"**State Synchronization:** `{row['datetime']}`")
-
-col1, col2 = st.columns([1, 1.3])
-
-with col1:
-    st.subheader("🏠 Spatial State")
-    st.markdown(f"""
-        <div style="background-color: {status_color}; padding: 30px; border-radius: 15px; text-align: center; border: 2px solid #dee2e6;">
-            <h1 style="font-size: 80px; margin: 0;">🏠</h1>
-            <h2>{status_label}</h2>
-            <p>Load: <b>{total_load:.2f} kW</b> | Price: <b>${price:.2f}</b></p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    if is_critical:
-        st.warning("🤖 **PPO Agent:** Load-shedding active.")
-    else:
-        st.success("🤖 **PPO Agent:** Normal Monitoring.")
-
-with col2:
-    st.subheader("📊 Appliance Breakdown")
-    app_list = ['Fridge', 'Heater', 'Fans', 'Lights', 'TV', 'Microwave', 'Washing_Machine']
-    fig_pie = px.pie(names=app_list, values=[float(row[a]) for a in app_list], hole=0.4)
-    fig_pie.update_layout(height=350, margin=dict(t=20, b=20, l=20, r=20))
-    st.plotly_chart(fig_pie, use_container_width=True)
-
-st.divider()
-
-# --- XAI SECTION ---
-st.subheader("🔍 Explainable AI (XAI) Insight")
-features = ['Electricity Price', 'Total Demand', 'Occupancy', 'Meal Context']
-# Weights derived from the specific hour's data
-weights = [price * 3, total_load / 1.5, occupancy * 0.4, is_meal * 1.2]
-
-fig_xai, ax = plt.subplots(figsize=(10, 3))
-ax.barh(features, weights, color=['#ff4b4b' if w > 1.0 else '#0068c9' for w in weights])
-ax.set_title("Feature Attribution for PPO Decision")
-st.pyplot(fig_xai)
-
-# --- TREND SECTION ---
-st.subheader("📈 24-Hour Forecast Trend")
-fig_line = px.line(df, x='datetime', y=app_list, template="plotly_white")
-st.plotly_chart(fig_line, use_container_width=True)
+st.metric("Peak Hours in Forecast", f"{ppo['peak_hours']} / {len(df)}")
+
+@st.fragment
+def interactive_panel(df, ppo, xai, donuts):
+    # Only this panel reruns when the slider moves; the title and the cached figures stay as they are.
+    # Fragments cannot place widgets in the sidebar, so the hour slider lives at the top here.
+    selected_hour = st.slider("🕹️ Select Forecast Hour", 0, len(df)-1, 0)
+    price = float(ppo['price'][selected_hour])
+    total_load = float(ppo['total'][selected_hour])
+
+    is_critical = bool(ppo['critical'][selected_hour])
+    agent_msg = ppo['message'][selected_hour]
+    status_label = ppo['label'][selected_hour]
+    status_color = ppo['color'][selected_hour]
+
+    st.write(f"**State Synchronization:** `{ppo['stamp'][selected_hour]}`")
+
+    col1, col2 = st.columns([1, 1.3])
+
+    with col1:
+        st.subheader("🏠 Spatial State")
+        st.markdown(_HOUSE_TMPL.format(glow=status_color, status=status_label, load=total_load, price=price),
+                    unsafe_allow_html=True)
+
+        if is_critical:
+            st.warning(agent_msg)
+        else:
+            st.success(agent_msg)
+
+    with col2:
+        st.subheader("📊 Appliance Breakdown")
+        st.markdown(donuts[selected_hour], unsafe_allow_html=True)
+
+    st.divider()
+
+    # --- XAI SECTION ---
+    st.subheader("🔍 Explainable AI (XAI) Insight")
+    # Chart for this hour, built from its precompute_xai weights in xai_hour_fig
+    st.plotly_chart(xai_hour_fig(xai, selected_hour), use_container_width=True)
+
+    # --- TREND SECTION ---
+    st.subheader("📈 Forecast Trend Around the Selected Hour")
+    st.plotly_chart(trend_fig(df, tuple(APP_COLS), selected_hour), use_container_width=True)
+    st.caption(f"Showing ±{TREND_WINDOW} h around the selected hour. Double-click the chart for the whole forecast.")
+
+donuts = build_donuts(ppo['apps'], tuple(APP_COLS))
+interactive_panel(df, ppo, xai, donuts)
@@ -19,26 +19,26 @@ df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
 df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
 
 # Defining appliances exactly as they appear in your CSV headers
-appliances = ['Fridge', 'Heater', 'Fans', 'Lights', 'TV', 'Microwave', 'Washing Machine']
+appliances = ['Fridge', 'Heater', 'Fans', 'Lights', 'TV', 'Microwave', 'Washing_Machine']
 features = ['hour_sin', 'hour_cos', 'occupancy', 'electricity_price']
 
 print("Training XGBoost Forecasting Engine...")
 
-# 3. Training Loop
-models = {}
-for app in appliances:
-    X = df[features]
-    y = df[app]
-    
-    # We use a Regressor for the Digital Twin forecast
-    model = xgb.XGBRegressor(
-        objective='reg:squarederror',
-        n_estimators=100,
-        learning_rate=0.1,
-        max_depth=5
-    )
-    model.fit(X, y)
-    models[app] = model
+# 3. Training
+# One multi-output Regressor forecasts every appliance at once: the 'hist' tree builder
+# shares its feature histograms across all targets instead of fitting 7 separate models
+X = df[features].to_numpy()
+Y = df[appliances].to_numpy()
+
+model = xgb.XGBRegressor(
+    objective='reg:squarederror',
+    tree_method='hist',
+    multi_strategy='multi_output_tree',
+    n_estimators=100,
+    learning_rate=0.1,
+    max_depth=5
+)
+model.fit(X, Y)
 
 # 4. Generate Future 24-Hour Forecast
 print("Generating next-day predictions...")
@@ -51,18 +51,21 @@ future_df['hour_sin'] = np.sin(2 * np.pi * future_df['hour'] / 24)
 future_df['hour_cos'] = np.cos(2 * np.pi * future_df['hour'] / 24)
 
 # Simulate Environment for the Digital Twin
+h = future_df['hour'].to_numpy()
+evening = (h >= 18) & (h <= 22)
+
 # Occupancy: Higher in morning/evening
-future_df['occupancy'] = [np.random.randint(3, 6) if (7<=h<=9 or 18<=h<=22) else np.random.randint(1, 3) for h in future_df['hour']]
+busy = ((h >= 7) & (h <= 9)) | evening
+future_df['occupancy'] = np.where(busy, np.random.randint(3, 6, len(h)), np.random.randint(1, 3, len(h)))
 
 # Electricity Price: Peak hours are expensive (Correcting the logic for PPO)
-future_df['electricity_price'] = [0.6 if (7<=h<=10 or 18<=h<=22) else 0.2 for h in future_df['hour']]
-
-# Apply models to predict future load
-for app in appliances:
-    X_future = future_df[features]
-    future_df[app] = models[app].predict(X_future)
-    # Ensure no negative values
-    future_df[app] = future_df[app].clip(lower=0)
+peak = ((h >= 7) & (h <= 10)) | evening
+future_df['electricity_price'] = np.where(peak, 0.6, 0.2)
+
+# Apply the model to predict future load (one hours x appliances matrix)
+X_future = future_df[features].to_numpy()
+# Ensure no negative values
+future_df[appliances] = np.clip(model.predict(X_future), 0, None)
 
 # 5. Save Output for app.py
 output_path = 'data/next_day_prediction.csv'